@@ -6,16 +6,30 @@ Your goal is to implement the functions and methods required to enable choose_ac
 Original Mario Manual: https://www.thegameisafootarcade.com/wp-content/uploads/2017/04/Super-Mario-Land-Game-Manual.pdf
 """
 
+import functools
+import io
+import itertools
 import json
 import logging
-import random
 import math
+import multiprocessing
+import queue
+import random
+import threading
 
 import cv2
+import numpy as np
 from mario_environment import MarioEnvironment
 from pyboy.utils import WindowEvent
 from enum import Enum
 
+try:
+    from numba import njit
+except ImportError: # numba is optional, the NumPy scans are used without it
+    njit = None
+
+logger = logging.getLogger(__name__)
+
 class Action(Enum):
     DOWN = 0
     LEFT = 1
@@ -47,11 +61,269 @@ class Element(Enum):
     FLY = 18
     ARCHER = 19
 
-row, col = 0, 0
-prev_x = 0
-curr_x = 0
-prev_action = Action.RIGHT
-next_action = Action.RIGHT
+class Obstacle(Enum):
+    NONE = 0
+    FOUND = 1
+    STAIRS = 2
+
+# plain ints for the hot paths, one global lookup instead of Enum attribute chains (and constants to numba)
+_GROUND, _BLOCK, _PIPE, _POWERUP, _MARIO, _EMPTY, _GUMBA, _TOAD, _FLY, _ARCHER = (
+    e.value for e in (Element.GROUND, Element.BLOCK, Element.PIPE, Element.POWERUP, Element.MARIO,
+                      Element.EMPTY, Element.GUMBA, Element.TOAD, Element.FLY, Element.ARCHER))
+(_A_DOWN, _A_LEFT, _A_RIGHT, _A_UP, _A_JUMP, _A_PRESS_B, _A_JUMP_OBS, _A_JUMP_EMPTY, _A_JUMP_POWER_UP,
+ _A_JUMP_SKIP_ENEMY, _A_JUMP_RIGHT, _A_ENEMY_LEFT, _A_JUMP_STAIRS, _A_TUNNEL_LEFT, _A_JUMP_BIG_GAP,
+ _A_JUMP_EMPTY_REDUCED) = (a.value for a in Action)
+_OBS_NONE, _OBS_FOUND, _OBS_STAIRS = (o.value for o in Obstacle)
+
+# squared distance thresholds, so scans never need a sqrt
+_JUMP_OBS_SQ = 4.0 # 2.0
+_EMPTY_SQ = 8.41 # 2.9, changed from 2.5
+_POWERUP_SQ = 9.0 # 3.0
+_PLATFORM_SQ = 49.0 # 7.0
+_ENEMY_CLOSE_SQ = 20.25 # 4.5
+_NO_ENEMY_SQ = 10000 ** 2
+
+# actions to look ahead with emulator save states before committing to one, 0 just follows the rules
+_SEARCH_DEPTH = 0
+_SEARCH_ACTIONS = (_A_RIGHT, _A_JUMP_RIGHT, _A_JUMP_OBS, _A_JUMP_EMPTY, _A_LEFT)
+# worker processes that play out the lookahead in parallel, each with its own emulator, 0 searches in this process
+_SEARCH_WORKERS = 0
+
+def _perceive_kernel(game_area, up, down, left1, left2, left3, right1):
+    """
+    Fused version of the find_*/check_* scans used by choose_action, walking the game area once instead of once per scan.
+    The neighbour arrays are the shifted views from MarioExpert.update_neighbours.
+    Returns (row, col, enemy_row, enemy_col, enemy_dist_sq, enemy_type, obstacle, empty_jump, power_up, on_ground)
+    """
+    height, width = game_area.shape
+
+    # mario's top right corner, first hit in row-major order
+    row, col = 0, 0
+    for a in range(height * width):
+        if game_area[a // width, a % width] == _MARIO:
+            row, col = a // width, a % width + 1
+            break
+
+    enemy_row, enemy_col = 10000, 0
+    enemy_dist_sq, enemy_type = _NO_ENEMY_SQ, -1
+    obstacle = _OBS_NONE
+    obstacle_found = row > 14
+    empty_jump = False
+    power_up_dist_sq = -1
+    on_ground = False
+
+    # columns first so the first hit of each scan is the closest column to the right of Mario
+    for b in range(width):
+        for a in range(height):
+            value = game_area[a, b]
+            dist_sq = (a - row) * (a - row) + (b - col) * (b - col)
+
+            if value >= _GUMBA:
+                if a < enemy_row or (a == enemy_row and b < enemy_col):
+                    enemy_row, enemy_col = a, b
+                if enemy_type == -1 and b >= col:
+                    enemy_dist_sq, enemy_type = dist_sq, value
+
+            elif (not obstacle_found and b > col and dist_sq <= _JUMP_OBS_SQ and
+                  (value == _BLOCK or value == _PIPE or
+                   (value == _GROUND and a <= row + 1))):
+                obstacle_found = True
+                obstacle = _OBS_FOUND
+                if (value == _GROUND and a == row + 1 and
+                        down[a, b] == _GROUND and up[a, b] != _GROUND):
+                    obstacle = _OBS_STAIRS
+
+            if value == _GROUND and b == col:
+                if right1[a, b] == _GROUND and left1[a, b] == _GROUND:
+                    on_ground = True
+
+            elif value == _EMPTY and a == row + 2 and b > col and dist_sq <= _EMPTY_SQ:
+                run = left1[a, b]
+                if ((run == _GROUND or run == _BLOCK) and
+                        left2[a, b] == run and left3[a, b] == run):
+                    empty_jump = True
+
+            elif value == _POWERUP and power_up_dist_sq == -1 and a <= row and b >= col:
+                power_up_dist_sq = dist_sq
+
+    power_up = (on_ground and 0 <= power_up_dist_sq <= _POWERUP_SQ and row + 2 < height and
+                game_area[row + 2, col] == _GROUND)
+    return row, col, enemy_row, enemy_col, enemy_dist_sq, enemy_type, obstacle, empty_jump, power_up, on_ground
+
+def _roll_into(out, array, shift, axis):
+    """
+    Same as np.roll(array, shift, axis) but writes into out instead of allocating a new array
+    """
+    src, dst = np.moveaxis(array, axis, 0), np.moveaxis(out, axis, 0)
+    shift %= src.shape[0]
+    dst[shift:] = src[:src.shape[0] - shift]
+    dst[:shift] = src[src.shape[0] - shift:]
+
+def _pack_rows(mask):
+    """
+    Packs each row of a boolean mask into a Python int with bit b set when column b is, so a row can be searched with a
+    couple of shifts instead of a cell at a time
+    """
+    packed = np.packbits(mask, axis=1, bitorder='little').astype(np.uint32)
+    shifts = np.arange(0, 8 * packed.shape[1], 8, dtype=np.uint32)
+    return np.bitwise_or.reduce(packed << shifts, axis=1).tolist()
+
+def _rotate_left(bits, shift, width):
+    """
+    Bit b of the result is bit b-shift of a width wide row, wrapping around like np.roll
+    """
+    return ((bits << shift) | (bits >> (width - shift))) & ((1 << width) - 1)
+
+def _choose_action(game_area, percept, prev_action, stalled, edge_case, world, stage):
+    """
+    The expert's rules. Picks the next action value from the perceive() tuple, the previous action value and the extra
+    state described in MarioExpert._decide. Only uses ints so numba can compile it along with the perception kernel
+    """
+    (row, col, enemy_row, enemy_col, enemy_dist_sq, enemy_type,
+     obstacle_check, empty_jump, power_up, _) = percept
+
+    if row < 14:
+
+        # CHECK IF STANDING ON A PIPE
+        if game_area[row + 2, col] == _PIPE:
+            if (prev_action == _A_JUMP or prev_action == _A_JUMP_EMPTY or
+                    prev_action == _A_JUMP_OBS or prev_action == _A_JUMP_POWER_UP):
+                curr_action = _A_UP
+            else:
+                curr_action = _A_JUMP_RIGHT
+
+        # CHECK IF THERE IS AN ENEMY ABOVE
+        elif enemy_row < row and enemy_col > col and enemy_dist_sq < 6.0 ** 2:
+            curr_action = _A_LEFT
+
+        # CHECK IF THERE IS AN ENEMY BELOW
+        elif (row + 2 <= enemy_row and
+                enemy_row != 0 and
+                prev_action == _A_RIGHT and
+                (game_area[row + 2, col] != _EMPTY and
+                enemy_dist_sq < 7 ** 2)):
+            curr_action = _A_JUMP_EMPTY
+
+        # IF TOO CLOSE TO AN ENEMY, REACT
+        elif enemy_dist_sq <= _ENEMY_CLOSE_SQ:
+            # PROCESS GUMBAS
+            if enemy_type == _GUMBA:
+                # normal case
+                if prev_action == _A_RIGHT:
+                    curr_action = _A_JUMP # jump over gumba
+                # edge cases
+                # mario too close to gumba, just skip gumba
+                elif prev_action == _A_ENEMY_LEFT and enemy_dist_sq < 2 ** 2 and enemy_dist_sq > 1.5 ** 2:
+                    curr_action = _A_JUMP_SKIP_ENEMY
+                # if prev action was jump, can't jump again
+                elif prev_action == _A_ENEMY_LEFT and enemy_dist_sq >= 1.5 ** 2:
+                    # can jump over enemy now, needs to jump to the right
+                    # print("jump right")
+                    curr_action = _A_JUMP
+
+                # mario just jumped or in air
+                elif prev_action == _A_JUMP:
+                    if enemy_dist_sq < 5 ** 2:
+                        # safe to move left
+                        curr_action = _A_ENEMY_LEFT
+                    else:
+                        curr_action = _A_JUMP_RIGHT
+
+                else:
+                    curr_action = _A_JUMP
+
+            # PROCESS TOAD ENEMIES
+            elif enemy_type == _TOAD and enemy_dist_sq <= 4 ** 2:
+                if prev_action == _A_JUMP:
+                    curr_action = _A_LEFT
+                else:
+                    curr_action = _A_JUMP
+
+            # PROCESS FLY ENEMIES
+            elif enemy_type == _FLY and enemy_dist_sq <= 3 ** 2:
+                if prev_action == _A_JUMP:
+                    curr_action = _A_LEFT
+                else:
+                    curr_action = _A_JUMP
+
+            # PROCESS ARCHER ENEMIES
+            # only jump if it's on the same row, otherwise just escape
+            elif enemy_type == _ARCHER and enemy_dist_sq <= 4 ** 2 and enemy_row == row:
+                if prev_action == _A_JUMP:
+                    curr_action = _A_LEFT
+                else:
+                    curr_action = _A_JUMP
+
+            else:
+                curr_action = _A_RIGHT
+
+        # CHECK EMPTY JUMP (PLATFORMS, OR HOLES)
+        elif empty_jump:
+            if edge_case and stage == 1 and world == 1: # edge case
+                curr_action = _A_UP
+            # IN LEVEL 1-2, JUMP SHORTER DISTANCES
+            elif world == 1 and stage == 2:
+                curr_action = _A_JUMP_EMPTY_REDUCED
+            elif prev_action == _A_JUMP_EMPTY or prev_action == _A_JUMP_BIG_GAP or prev_action == _A_JUMP_EMPTY_REDUCED:
+                curr_action = _A_LEFT
+            elif prev_action == _A_UP:
+                curr_action = _A_JUMP_BIG_GAP
+            else:
+                curr_action = _A_JUMP_EMPTY
+
+        # JUMP TO COLLECT POWER UP BOXES
+        elif power_up:
+            if prev_action == _A_JUMP_POWER_UP:
+                curr_action = _A_RIGHT
+            elif prev_action == _A_JUMP:
+                curr_action = _A_UP # stop so that mario can check for power ups
+            else:
+                curr_action = _A_JUMP_POWER_UP
+
+        # JUMP OVER OBSTACLES
+        elif obstacle_check != _OBS_NONE:
+            if stalled and obstacle_check == _OBS_STAIRS:
+                curr_action = _A_JUMP_STAIRS
+
+            elif prev_action == _A_JUMP_OBS:
+                curr_action = _A_RIGHT
+
+            else:
+                curr_action = _A_JUMP_OBS
+
+        elif row == 0:
+            curr_action = _A_UP  # when mario is off screen/ dead, move up
+        else:
+            curr_action = _A_RIGHT
+
+    else:
+        curr_action = _A_UP
+
+    # fix up stuck condition
+    if prev_action == _A_UP and curr_action == _A_UP:
+        curr_action = _A_RIGHT
+
+    return curr_action
+
+def _decide_kernel(game_area, up, down, left1, left2, left3, right1, prev_action, stalled, edge_case, world, stage):
+    """
+    Perception and decision in one compiled call. Returns (action value, perceive() tuple)
+    """
+    percept = _perceive_kernel(game_area, up, down, left1, left2, left3, right1)
+    return _choose_action(game_area, percept, prev_action, stalled, edge_case, world, stage), percept
+
+if njit is None:
+    _perceive_kernel = None
+    _decide_kernel = None
+else:
+    _perceive_kernel = njit(cache=True)(_perceive_kernel)
+    _choose_action = njit(cache=True)(_choose_action)
+    _decide_kernel = njit(cache=True)(_decide_kernel)
+    # compile now rather than on the first frame, for the read-only array MarioExpert._decide rebuilds from bytes
+    _game_area = np.frombuffer(bytes(16 * 20), dtype=np.int8).reshape(16, 20)
+    _neighbours = [np.zeros((16, 20), dtype=np.int8) for _ in range(6)]
+    _perceive_kernel(_game_area, *_neighbours)
+    _decide_kernel(_game_area, *_neighbours, _A_RIGHT, False, False, 1, 1)
 
 class MarioController(MarioEnvironment):
     """
@@ -101,116 +373,104 @@ class MarioController(MarioEnvironment):
         self.valid_actions = valid_actions
         self.release_button = release_button
 
+        press_a, release_a = WindowEvent.PRESS_BUTTON_A, WindowEvent.RELEASE_BUTTON_A
+        press_left, release_left = WindowEvent.PRESS_ARROW_LEFT, WindowEvent.RELEASE_ARROW_LEFT
+        press_right, release_right = WindowEvent.PRESS_ARROW_RIGHT, WindowEvent.RELEASE_ARROW_RIGHT
+
+        # (press, ticks, release) steps for every action, run in order by run_action. None means no input for that part
+        # normal hold duration on the plain button actions
+        self._recipes = {
+            action: [(press, act_freq, release)]
+            for action, (press, release) in enumerate(zip(valid_actions, release_button))
+        }
+        self._recipes.update({
+            # extended hold duration when jumping over obstacles
+            _A_JUMP_OBS: [(press_a, act_freq * 10, release_a)],
+            _A_JUMP_POWER_UP: [(press_a, act_freq, release_a)],
+            _A_JUMP_EMPTY: [(press_a, 0, None), (press_right, act_freq * 5, release_a), (None, 0, release_right)],
+            _A_JUMP_BIG_GAP: [(press_a, act_freq * 10, release_a), (None, 0, release_right)],
+            _A_ENEMY_LEFT: [(press_left, act_freq, release_left)],
+            _A_TUNNEL_LEFT: [(press_left, act_freq * 2, release_left)],
+            _A_JUMP_SKIP_ENEMY: [(press_a, 0, None), (press_right, act_freq * 2, release_right), (None, 0, release_a)],
+            # normal jump right with normal button press timings
+            _A_JUMP_RIGHT: [(press_a, 0, None), (press_right, act_freq, release_right), (None, 0, release_a)],
+            # step back, then run and jump up the stairs
+            _A_JUMP_STAIRS: [(press_left, int(act_freq * 0.2), release_left), (press_right, act_freq, None),
+                             (press_a, act_freq, release_a), (None, 0, release_right)],
+            _A_JUMP_EMPTY_REDUCED: [(press_a, 0, None), (press_right, act_freq, release_a), (None, 0, release_right)],
+        })
+
     def run_action(self, action: int) -> None:
         """
         Runs actions by pushing buttons for a set period of time. Certain actions can be pressed for longer, with different codes corresponding to each case.
-        Action.JUMP <= Action.JUMP_OBS (jump obstacle)
+        Each action is a recipe of (press, ticks, release) steps built in __init__
         """
-        # extended hold duration when jumping over obstacles
-        if action == Action.JUMP_OBS.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            for _ in range(self.act_freq*10):
-                self.pyboy.tick()
-
-            action = Action.JUMP.value
-
-        elif action == Action.JUMP_POWER_UP.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            for _ in range(self.act_freq):
-                self.pyboy.tick()
-            
-            action = Action.JUMP.value
-            #self.pyboy.send_input(self.release_button[action])
-        elif action == Action.JUMP_EMPTY.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-
-            for _ in range(self.act_freq * 5):
-                self.pyboy.tick()
-            
-            print("releasing right jump empty")
-            self.pyboy.send_input(self.release_button[Action.JUMP.value])            
-            action = Action.RIGHT.value
-        
-        elif action == Action.JUMP_BIG_GAP.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            # self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-
-            for _ in range(self.act_freq * 10):
-                self.pyboy.tick()
-            
-            print("releasing right jump empty")
-            self.pyboy.send_input(self.release_button[Action.JUMP.value])            
-            action = Action.RIGHT.value
-
-        elif action == Action.ENEMY_LEFT.value:
-            self.pyboy.send_input(self.valid_actions[Action.LEFT.value])
-            time = int(self.act_freq)
-            for _ in range(time):
-                self.pyboy.tick()
-            
-            print("releasing enemy left")
-            action = Action.LEFT.value
-
-        elif action == Action.TUNNEL_LEFT.value:
-            self.pyboy.send_input(self.valid_actions[Action.LEFT.value])
-            for _ in range(self.act_freq*2):
-                self.pyboy.tick()
-            
-            action = Action.LEFT.value
-            
-        elif action == Action.JUMP_SKIP_ENEMY.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-            for _ in range(self.act_freq * 2):
-                self.pyboy.tick()
-            self.pyboy.send_input(self.release_button[Action.RIGHT.value])
-            action = Action.JUMP.value
-        
-        elif action == Action.JUMP_RIGHT.value:
-            # normal jump right with normal button press timings
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-            for _ in range(self.act_freq):
-                self.pyboy.tick()
-            self.pyboy.send_input(self.release_button[Action.RIGHT.value])
-            action = Action.JUMP.value
-        
-        elif action == Action.JUMP_STAIRS.value:
-            # normal jump right with normal button press timings
-            self.pyboy.send_input(self.valid_actions[Action.LEFT.value])
-            time = int(self.act_freq * 0.2)
-            for _ in range(time):
-                self.pyboy.tick()
-            self.pyboy.send_input(self.release_button[Action.LEFT.value])
-            
-            self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-            for _ in range(self.act_freq): 
-                self.pyboy.tick()
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            for _ in range(self.act_freq):
-                self.pyboy.tick()
-            self.pyboy.send_input(self.release_button[Action.JUMP.value])
-            action = Action.RIGHT.value
-
-        elif action == Action.JUMP_EMPTY_REDUCED.value:
-            self.pyboy.send_input(self.valid_actions[Action.JUMP.value])
-            self.pyboy.send_input(self.valid_actions[Action.RIGHT.value])
-
-            for _ in range(self.act_freq * 1):
-                self.pyboy.tick()
-            
-            print("REDUCED JUMP EMPTY")
-            self.pyboy.send_input(self.release_button[Action.JUMP.value])            
-            action = Action.RIGHT.value
+        for press, ticks, release in self._recipes[action]:
+            if press is not None:
+                self.pyboy.send_input(press)
+            self._tick_n(ticks)
+            if release is not None:
+                self.pyboy.send_input(release)
+
+    def _tick_n(self, n: int) -> None:
+        """
+        Advances the emulator n frames in a single call. PyBoy 2.x loops over them natively and only renders the last one
+        """
+        if n > 0:
+            self.pyboy.tick(n)
 
-        else:
-            # normal hold duration on all other inputs
-            self.pyboy.send_input(self.valid_actions[action])
-            for _ in range(self.act_freq):
-                self.pyboy.tick()
+_worker_env = None # each search worker process's own emulator
+
+def _init_search_worker():
+    global _worker_env
+    _worker_env = MarioController(headless=True)
+
+def _evaluate_sequence(actions, state):
+    """
+    Runs in a search worker. Plays actions from the save state on the worker's own emulator and returns how far right
+    Mario ends up, or -inf if he loses a life on the way
+    """
+    env = _worker_env
+    env.pyboy.load_state(io.BytesIO(state))
+    lives = env.get_lives()
+    for action in actions:
+        env.run_action(action)
+        if env.get_lives() < lives or env.get_game_over():
+            return -math.inf
+    return env.get_x_position()
+
+class AsyncVideoWriter:
+    """
+    Wraps a cv2.VideoWriter so frames are encoded on a background thread instead of blocking the game loop.
+
+    Args:
+        writer (cv2.VideoWriter): The writer that does the actual encoding.
+        max_frames (int): How many frames can wait to be encoded before write blocks. Defaults to 64.
+    """
+
+    def __init__(self, writer, max_frames: int = 64) -> None:
+        self.writer = writer
+        self._frames = queue.Queue(maxsize=max_frames)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            frame = self._frames.get()
+            if frame is None: # sent by release
+                break
+            self.writer.write(frame)
+
+    def write(self, frame) -> None:
+        self._frames.put(np.ascontiguousarray(frame))
 
-        self.pyboy.send_input(self.release_button[action])
+    def release(self) -> None:
+        """
+        Waits for the queued frames to be written, then closes the file
+        """
+        self._frames.put(None)
+        self._thread.join()
+        self.writer.release()
 
 class MarioExpert:
     """
@@ -232,26 +492,40 @@ class MarioExpert:
 
         self.video = None
 
-    def get_distance(self, row0, col0, row1, col1):
-        return math.sqrt(((col1-col0) * (col1-col0)) + ((row1-row0) * (row1-row0))) # pythagoras
+        # what happened on the previous step, the rules react to both
+        self.prev_action = Action.RIGHT
+        self.prev_x = 0
+
+        self._decide = functools.lru_cache(maxsize=4096)(self._decide)
+
+        # reused every frame instead of allocating a fresh game area and shifted copies of it
+        self._ga_buf = np.empty((16, 20), dtype=np.int8)
+        self._up, self._down, self._left1, self._left2, self._left3, self._right1 = (
+            np.empty_like(self._ga_buf) for _ in range(6))
+        # (game area bytes, x position, depth) -> (best action value, value) for the lookahead search
+        self._tt = {}
+        self._pool = None # created on first use by _search_parallel
+
+        # row and column index of every cell as (16, 1) and (1, 20) arrays, broadcast against the game area by the scans
+        self._rows, self._cols = np.ogrid[:16, :20]
+
+    def get_dist_sq(self, row0, col0, row1, col1):
+        drow = row1 - row0
+        dcol = col1 - col0
+        return drow * drow + dcol * dcol # pythagoras without the sqrt, also works on index grids
 
     """
     Checks surroundings of Mario, to see if he's in the air. Returns true if all surrounding values are the same
     """
     def check_surrounding(self, row, col, game_area, value):
-        print(f"checking surrounding for {value}")
-        return (game_area[row - 1][col - 2] == value and
-                game_area[row - 1][col - 1] == value and
-                game_area[row - 1][col] == value and
-                game_area[row - 1][col + 1] == value and
-                game_area[row][col - 2] == value and
-                game_area[row][col + 1] == value and
-                game_area[row + 1][col - 2] == value and
-                game_area[row + 1][col + 1] == value and
-                game_area[row + 2][col - 2] == value and
-                game_area[row + 2][col - 1 == value] and
-                game_area[row + 2][col] == value and
-                game_area[row + 2][col + 1] == value)
+        logger.debug("checking surrounding for %s", value)
+        # 4x4 tile around mario's 2x2 footprint, (row, col) being his top right corner
+        if row < 1 or col < 2 or row + 3 > game_area.shape[0] or col + 2 > game_area.shape[1]:
+            return False
+        tile = game_area[row - 1:row + 3, col - 2:col + 2]
+        ring = np.ones(tile.shape, dtype=bool)
+        ring[1:3, 1:3] = False # skip mario's own cells
+        return bool((tile[ring] == value).all())
 
     """
     Gets mario's position, returns the top right corner of Mario
@@ -259,308 +533,266 @@ class MarioExpert:
     11
     """
     def find_mario(self, game_area, row, col):
-        x, y = game_area.shape
-        for a in range(x):
-            for b in range(y):
-                if game_area[a][b] == 1:
-                    return (a, b + 1)
+        mario = np.argwhere(game_area == _MARIO) # row-major, first hit is top left
+        if mario.size:
+            return int(mario[0, 0]), int(mario[0, 1]) + 1
         return 0, 0  # if mario is not found
-    
+
+    def find_enemies(self, row, col, game_area):
+        """
+        Both enemy lookups from one scan. Returns the top left enemy's row and column, then the squared distance and type
+        of the enemy in the closest column at or to the right of Mario
+        """
+        enemies = np.argwhere(game_area >= _GUMBA)
+        if not enemies.size:
+            return 10000, 0, _NO_ENEMY_SQ, None
+        enemy_row, enemy_col = int(enemies[0, 0]), int(enemies[0, 1])
+
+        ahead = enemies[enemies[:, 1] >= col]
+        if not ahead.size:
+            # Return a default large squared distance and a default value if no enemy is found
+            return enemy_row, enemy_col, _NO_ENEMY_SQ, None
+        a, b = ahead[np.argmin(ahead[:, 1] * game_area.shape[0] + ahead[:, 0])] # closest column, then top row
+        return enemy_row, enemy_col, self.get_dist_sq(row, col, a, b), game_area[a, b]
+
     def find_enemy(self, game_area):
-        x,y = game_area.shape
-        for a in range(x):
-            for b in range(y):
-                if game_area[a][b] >= Element.GUMBA.value:
-                    return (a, b)
-        return 10000,0
+        return self.find_enemies(0, 0, game_area)[:2]
     
     def get_enemy_dist(self, row, col, game_area):
-        x, y = game_area.shape  # x is the number of rows, y is the number of columns
-        for b in range(y):  # Iterate over columns
-            for a in range(x):  # Iterate over rows
-                # Check for blocks
-                if game_area[a, b] >= 15:  # found enemy
-                    # Compute distance 
-                    if b >= col:  # If enemy is to the right of Mario
-                        distance = self.get_distance(row, col, a, b)
-                        return distance, game_area[a, b]
-        # Return a default large distance and a default value if no enemy is found
-        return 10000, None
+        return self.find_enemies(row, col, game_area)[2:]
 
     def check_platform_jump(self, row, col, game_area):
-        x, y = game_area.shape  # x is the number of rows, y is the number of columns
-        for b in range(y):  # Iterate over columns
-            for a in range(x):  # Iterate over rows
-                # Check for blocks
-                if game_area[a, b] == Element.BLOCK.value:
-                    # Compute distance
-                    if a < row and b > col:  # If block is above and to the right of Mario
-                        distance = self.get_distance(row, col, a, b)
-                        print(f"distance to platform: {distance}")
-                        if distance <= 7.0:
-                            return True  # Found platform to jump on
-        return False
+        # blocks above and to the right of Mario, only up to 7 tiles away can be in range
+        top, right = max(0, row - 7), col + 8
+        platforms = game_area[top:row, col + 1:right] == _BLOCK
+        dist_sq = self.get_dist_sq(row, col, self._rows[top:row], self._cols[:, col + 1:right])
+        return bool((platforms & (dist_sq <= _PLATFORM_SQ)).any()) # Found platform to jump on
 
     """
     Check for obstacle to jump over
     """
     def check_obstacle(self, row, col, game_area):
-        x, y = game_area.shape  # x is the number of rows, y is the number of columns
-        if row <= 14: 
-            for b in range(y):  # Iterate over columns
-                for a in range(x):  # Iterate over rows
-                    # Check for blocks or pipes
-                    if (game_area[a][b] == Element.BLOCK.value or 
-                        game_area[a][b] == Element.PIPE.value or
-                        (game_area[a][b] == Element.GROUND.value and b > col and a <= row+1)):
-                        if b > col:  # If block is to the right of Mario
-                            distance = self.get_distance(row, col, a, b)
-                            # print(f"distance to obs: {distance}")
-                            if game_area[a, b] == Element.BLOCK.value:
-                                if game_area[a+1,b] == Element.BLOCK.value and game_area[a-1,b] == Element.BLOCK.value:
-                                    print(f"Distance to block: {distance}")
-
-                            elif game_area[a,b] == Element.PIPE.value:
-                                print(f"distance to pipe: {distance}")
-
-                            elif game_area[a,b] == Element.GROUND.value:
-                                # print(f"block loc: {a,b}")
-                                # print(f"above value: {game_area[a-1,b]}")
-                                if game_area[a+1,b] == Element.GROUND.value:
-                                    # normal obstacle 
-                                    if game_area[a-1,b] == Element.GROUND.value:
-                                        print(f"Distance to Hill: {distance}")
-                                        if distance <= 1.0:
-                                            return "obstacle found"
-                                    # # if found stairs below mario
-                                    elif a == row+1: #and game_area[a-1,b] == Element.EMPTY.value:
-                                        if distance <= 2.0:
-                                            return "found stairs"
-                            
-                            if distance <= 2.0:
-                                return "obstacle found"  # jump over obstacle
-        return False
+        if row > 14:
+            return _OBS_NONE
+        # only rows within jump range of Mario can hold an obstacle
+        top, bottom = max(0, row - 2), min(game_area.shape[0], row + 3)
+        window = game_area[top:bottom]
+        # blocks or pipes to the right of Mario, or ground that isn't below him
+        obstacles = (window == _BLOCK) | (window == _PIPE)
+        obstacles[:row + 2 - top] |= window[:row + 2 - top] == _GROUND
+        bits = _pack_rows(obstacles)
+
+        # closest obstacle column on each row in jump range, keeping the closest column overall (top row on ties)
+        found = None
+        for a, row_bits in enumerate(bits, top):
+            ahead = row_bits >> (col + 1)
+            if ahead:
+                b = col + (ahead & -ahead).bit_length() # lowest set bit
+                if self.get_dist_sq(row, col, a, b) <= _JUMP_OBS_SQ and (found is None or b < found[1]):
+                    found = a, b
+        if found is None:
+            return _OBS_NONE
+
+        a, b = found
+        logger.debug("squared distance to obstacle: %s", self.get_dist_sq(row, col, a, b))
+        # ground level with mario's feet with ground below it but not above it
+        if (game_area[a, b] == _GROUND and a == row + 1 and
+                self._down[a, b] == _GROUND and self._up[a, b] != _GROUND):
+            return _OBS_STAIRS
+        return _OBS_FOUND  # jump over obstacle
 
     def check_empty_jump(self, row, col, game_area):
-        x, y = game_area.shape  # x is the number of rows, y is the number of columns
-        for b in range(y):  # Iterate over columns
-            for a in range(x):  # Iterate over rows
-                # Check for empty to the right below mario
-                if (game_area[a][b] == Element.EMPTY.value and (a == row+2) and (b > col)):  
-                        # check if ground is wide enough
-                        if ((game_area[a][b-1] == Element.GROUND.value and
-                            game_area[a][b-2] == Element.GROUND.value and
-                            game_area[a][b-3] == Element.GROUND.value) or 
-                            (game_area[a][b-1] == Element.BLOCK.value and
-                            game_area[a][b-2] == Element.BLOCK.value and
-                            game_area[a][b-3] == Element.BLOCK.value)): #and
-                            #(game_area[a-1][b-1]) in [0, 1]):
-                            # If ground is to the right and below of Mario and block next to it is ground
-                            print(f"Empty loc: {a},{b}")
-                            distance = self.get_distance(row, col, a, b)
-                            print(f"Distance to empty: {distance}")
-                            if distance <= 2.9: # changed from 2.5 to 2.9
-                                return True  # jump over empty
+        a = row + 2 # only empty squares to the right below mario matter
+        if a >= game_area.shape[0]:
+            return False
+        width = game_area.shape[1]
+        empty, ground, block = _pack_rows(game_area[a] == np.array([[_EMPTY], [_GROUND], [_BLOCK]]))
+
+        # check if ground is wide enough, bit b set when columns b-1 to b-3 are all ground (or all block)
+        ground_run = _rotate_left(ground, 1, width) & _rotate_left(ground, 2, width) & _rotate_left(ground, 3, width)
+        block_run = _rotate_left(block, 1, width) & _rotate_left(block, 2, width) & _rotate_left(block, 3, width)
+        ahead = (empty & (ground_run | block_run)) >> (col + 1)
+        if not ahead:
+            return False
+
+        b = col + (ahead & -ahead).bit_length() # closest one, the rest are further away
+        dist_sq = self.get_dist_sq(row, col, a, b)
+        if dist_sq <= _EMPTY_SQ:
+            logger.debug("Empty loc: %s,%s", a, b)
+            logger.debug("Squared distance to empty: %s", dist_sq)
+            return True  # jump over empty
         return False
 
     def check_power_up(self, row, col, game_area):
-        x, y = game_area.shape  # x is the number of rows, y is the number of columns
-        for b in range(y):  # Iterate over columns
-            for a in range(x):  # Iterate over rows
-                # Check for blocks
-                if game_area[a, b] == Element.POWERUP.value and self.check_on_ground(row, col, game_area) == True:
-                    if row >= a and b >= col:  # If power up is to the right and above Mario
-                        distance = self.get_distance(row, col, a, b)
-                        print(f"Distance to power up: {distance}")
-                        if distance <= 3.0 and game_area[row+2,col] == Element.GROUND.value: # if on ground
-                            return True
-                        return False # missed power up
+        if row + 2 >= game_area.shape[0] or not self.check_on_ground(row, col, game_area):
+            return False
+        # power ups to the right and above Mario, closest column first; anything past 3 columns is out of reach
+        cols, rows = np.nonzero((game_area[:row + 1, col:col + 4] == _POWERUP).T)
+        if not cols.size:
+            return False
+        dist_sq = self.get_dist_sq(row, col, rows[0], col + cols[0])
+        logger.debug("Squared distance to power up: %s", dist_sq)
+        return dist_sq <= _POWERUP_SQ and game_area[row+2,col] == _GROUND # if on ground, else missed power up
                     
     def check_on_ground(self, row, col, game_area):
-        x, y = game_area.shape
-        for b in range(y):  # Iterate over columns
-            for a in range(x):  # Iterate over rows
-                # Check for blocks
-                if game_area[a, b] == Element.GROUND.value:
-                    if col == b:  # If ground is under Mario
-                        # check adjacent squares for ground
-                        if game_area[a,b+1] == Element.GROUND.value and game_area[a][b-1] == Element.GROUND.value:
-                            return True
-        return False
-    
+        if not 0 <= col < game_area.shape[1]:
+            return False
+        # ground under Mario with ground on both adjacent squares
+        return bool(((game_area[:, col] == _GROUND) &
+                     (self._right1[:, col] == _GROUND) &
+                     (self._left1[:, col] == _GROUND)).any())
+
+    def update_neighbours(self, game_area):
+        """
+        Shifts the game area once per frame so neighbour checks become whole-array lookups instead of per-cell indexing,
+        e.g. self._up[a, b] == game_area[a-1, b]. Shifts wrap around the edges like negative indexes do.
+        The check_* helpers read these, so call this first when using them on their own
+        """
+        _roll_into(self._up, game_area, 1, axis=0)
+        _roll_into(self._down, game_area, -1, axis=0)
+        _roll_into(self._left1, game_area, 1, axis=1)
+        _roll_into(self._left2, game_area, 2, axis=1)
+        _roll_into(self._left3, game_area, 3, axis=1)
+        _roll_into(self._right1, game_area, -1, axis=1)
+
+    def perceive(self, game_area):
+        """
+        Runs every scan choose_action needs in one go, through the fused numba kernel when numba is installed.
+        Returns (row, col, enemy_row, enemy_col, enemy_dist_sq, enemy_type, obstacle, empty_jump, power_up, on_ground)
+        """
+        self.update_neighbours(game_area)
+        if _perceive_kernel is not None:
+            return _perceive_kernel(game_area, self._up, self._down,
+                                    self._left1, self._left2, self._left3, self._right1)
+
+        row, col = self.find_mario(game_area, 0, 0)
+        enemy_row, enemy_col, enemy_dist_sq, enemy_type = self.find_enemies(row, col, game_area)
+        return (row, col, enemy_row, enemy_col, enemy_dist_sq, enemy_type,
+                self.check_obstacle(row, col, game_area),
+                self.check_empty_jump(row, col, game_area),
+                self.check_power_up(row, col, game_area),
+                self.check_on_ground(row, col, game_area))
     
     def choose_action(self):
-        global prev_action, next_action, prev_x, curr_x
-        global row, col
-
-        curr_action = 0
-        state = self.environment.game_state()
-        game_area = self.environment.game_area()
-        print(game_area)
+        prev_action = self.prev_action
+        prev_x = self.prev_x
 
-        row,col = self.find_mario(game_area, row, col) # get game area
-        enemy_row, enemy_col = self.find_enemy(game_area)
+        game_area = self._ga_buf
+        np.copyto(game_area, self.environment.game_area(), casting='unsafe')
         curr_x = self.environment.get_x_position()
+        world, stage = self.environment.get_world(), self.environment.get_stage()
+
+        action, percept = self._decide(game_area.tobytes(), game_area.shape, prev_action.value,
+                                       prev_x == curr_x, 2282 <= curr_x <= 2286, world, stage)
+
+        # formatting the game area every frame is slow, only do it when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            row, col, enemy_row, enemy_col, enemy_dist_sq = percept[:5]
+            logger.debug("\n%s", game_area)
+            logger.debug("prev_action: %s", prev_action)
+            logger.debug("Mario loc: %s,%s", row, col)
+            logger.debug("curr_x: %s", curr_x)
+            logger.debug("Enemy loc: %s,%s", enemy_row, enemy_col)
+            logger.debug("Level: %s %s", world, stage)
+            logger.debug("enemy distance: %s", math.sqrt(enemy_dist_sq))
+            logger.debug("Action: %s", Action(action))
+
+        if _SEARCH_DEPTH > 0:
+            search = self._search_parallel if _SEARCH_WORKERS > 0 else self._search
+            action = search(_SEARCH_DEPTH, action)[0]
+
+        self.prev_action = Action(action) # record current action
+        self.prev_x = curr_x
+        return action  # Return the value of the current action
+
+    def _decide(self, ga_bytes, shape, prev_action, stalled, edge_case, world, stage):
+        """
+        Picks the next action value for a game area, the previous action value and the little bit of extra state the rules look at.
+        Only depends on its arguments, so __init__ wraps it in an lru_cache and repeated frames skip perception entirely.
+        stalled is True when Mario hasn't moved since the last action, edge_case when he is at the gap in 1-1 that needs an UP
+        Returns (action value, perceive() tuple)
+        """
+        game_area = np.frombuffer(ga_bytes, dtype=np.int8).reshape(shape)
 
-        print(f"prev_action: {prev_action}")
-        print(f"Mario loc: {row},{col}")
-        print(f"curr_x: {curr_x}")
-        print(f"Enemy loc: {enemy_row},{enemy_col}")
-        print(f"Level: {self.environment.get_world()} {self.environment.get_stage()}")
-        
-        # VARIABLES TO TRACK ENEMIES OR OBJECTS TO JUMP OVER/ REACT TO
-        enemy_dist, enemy_type = self.get_enemy_dist(row, col, game_area)
-        obstacle_check = self.check_obstacle(row, col, game_area)
-
-        print(f"enemy distance: {enemy_dist}")
-
-        if row < 14:
-            
-            # CHECK IF STANDING ON A PIPE
-            if game_area[row+2][col] == Element.PIPE.value:
-                    if(prev_action in [Action.JUMP, Action.JUMP_EMPTY, Action.JUMP_OBS, Action.JUMP_POWER_UP]):
-                        curr_action = Action.UP
-                        print("up pipe")
-                    else:
-                        print("jump off pipe")
-                        curr_action = Action.JUMP_RIGHT
-
-            # CHECK IF THERE IS AN ENEMY ABOVE
-            elif enemy_row < row and enemy_col > col and enemy_dist < 6.0:
-                curr_action = Action.LEFT
-
-            # CHECK IF THERE IS AN ENEMY BELOW
-            elif (row + 2 <= enemy_row and
-                    enemy_row != 0 and 
-                    prev_action in [Action.RIGHT]  and
-                    (game_area[row+2][col] != Element.EMPTY.value and
-                    enemy_dist < 7)): 
-                    print("jump skip over enemy")
-                    curr_action = Action.JUMP_EMPTY
-
-            # IF TOO CLOSE TO AN ENEMY, REACT
-            elif enemy_dist <= 4.5:
-                # PROCESS GUMBAS
-                if enemy_type == Element.GUMBA.value:
-                    # normal case
-                    if prev_action == Action.RIGHT:
-                        curr_action = Action.JUMP # jump over gumba
-                    # edge cases
-                    # mario too close to gumba, just skip gumba
-                    elif prev_action == Action.ENEMY_LEFT and enemy_dist < 2 and enemy_dist > 1.5:
-                        curr_action = Action.JUMP_SKIP_ENEMY
-                    # if prev action was jump, can't jump again
-                    elif prev_action == Action.ENEMY_LEFT and enemy_dist >= 1.5:
-                        # can jump over enemy now, needs to jump to the right
-                        # print("jump right")
-                        curr_action = Action.JUMP
-
-                    # mario just jumped or in air
-                    elif prev_action == Action.JUMP:
-                        if enemy_dist < 5:
-                            # safe to move left
-                            print("gumba left")
-                            curr_action = Action.ENEMY_LEFT 
-                        else:
-                            curr_action = Action.JUMP_RIGHT
-                    
-                    else:
-                        curr_action = Action.JUMP
-                
-                # PROCESS TOAD ENEMIES                    
-                elif enemy_type == Element.TOAD.value and enemy_dist <= 4:
-                    print("toad left")
-                    if prev_action == Action.JUMP:
-                        curr_action = Action.LEFT
-                    else:
-                        curr_action = Action.JUMP
-
-                # PROCESS FLY ENEMIES
-                elif enemy_type == Element.FLY.value and enemy_dist <= 3:
-                    if prev_action == Action.JUMP:
-                        print("fly left")
-                        curr_action = Action.LEFT
-                    else:
-                        curr_action = Action.JUMP
-
-                # PROCESS ARCHER ENEMIES
-                # only jump if it's on the same row, otherwise just escape
-                elif enemy_type == Element.ARCHER.value and enemy_dist <= 4 and enemy_row == row:
-                    if prev_action == Action.JUMP:
-                        print("archer left")
-                        curr_action = Action.LEFT
-                    else:
-                        curr_action = Action.JUMP
-
-                else:
-                    print("=====================")
-                    print("Unknown Enemy found")
-                    print(f"Unknown enemy value: {enemy_type}")
-                    print("=====================")
-                    curr_action = Action.RIGHT
-
-            # CHECK EMPTY JUMP (PLATFORMS, OR HOLES)
-            elif self.check_empty_jump(row, col, game_area):
-                if 2282 <= curr_x <= 2286 and self.environment.get_stage() == 1 and self.environment.get_world() == 1: # edge case
-                    curr_action = Action.UP
-                # IN LEVEL 1-2, JUMP SHORTER DISTANCES
-                elif self.environment.get_world() == 1 and self.environment.get_stage() == 2:
-                    print("jump empty reduced")
-                    curr_action = Action.JUMP_EMPTY_REDUCED
-                elif prev_action == Action.JUMP_EMPTY or prev_action == Action.JUMP_BIG_GAP or prev_action == Action.JUMP_EMPTY_REDUCED:
-                    print("jump over empty")
-                    curr_action = Action.LEFT
-                elif prev_action == Action.UP:
-                    curr_action = Action.JUMP_BIG_GAP
-                else:
-                    curr_action = Action.JUMP_EMPTY
-
-            # JUMP TO COLLECT POWER UP BOXES
-            elif self.check_power_up(row, col, game_area):
-                if(prev_action == Action.JUMP_POWER_UP):
-                    print("Power up right")
-                    curr_action = Action.RIGHT
-                elif prev_action == Action.JUMP:
-                    curr_action = Action.UP # stop so that mario can check for power ups
-                else:
-                    curr_action = Action.JUMP_POWER_UP
-
-            # JUMP OVER OBSTACLES
-            elif obstacle_check in ["obstacle found", "found stairs", True]:
-                print(f"prev_x: {prev_x}")
-                print(f"curr_x: {curr_x}")
-
-                if prev_x == curr_x and obstacle_check == "found stairs":
-                    curr_action = Action.JUMP_STAIRS
+        if _decide_kernel is not None:
+            self.update_neighbours(game_area)
+            return _decide_kernel(game_area, self._up, self._down, self._left1, self._left2, self._left3, self._right1,
+                                  prev_action, stalled, edge_case, world, stage)
 
-                elif prev_action == Action.JUMP_OBS:
-                    print("jump over obstacle")
-                    curr_action = Action.RIGHT
+        # VARIABLES TO TRACK ENEMIES OR OBJECTS TO JUMP OVER/ REACT TO
+        percept = self.perceive(game_area)
+        return _choose_action(game_area, percept, prev_action, stalled, edge_case, world, stage), percept
+    
+    def _search(self, depth, preferred):
+        """
+        Looks ahead depth actions by playing each candidate from a save state and scoring how far right Mario gets.
+        Losing a life prunes that branch. Results go in a transposition table so each state is only searched once,
+        and preferred (the rules' pick) is tried first so it wins ties.
+        Returns (best action value, value)
+        """
+        env = self.environment
+        key = (env.game_area().tobytes(), env.get_x_position(), depth)
+        if key in self._tt:
+            return self._tt[key]
+
+        start = io.BytesIO()
+        env.pyboy.save_state(start)
+        lives = env.get_lives()
+
+        best = (preferred, -math.inf)
+        for action in (preferred,) + tuple(a for a in _SEARCH_ACTIONS if a != preferred):
+            start.seek(0)
+            env.pyboy.load_state(start)
+            env.run_action(action)
+            if env.get_lives() < lives or env.get_game_over():
+                continue # nothing after dying matters
+            if depth > 1:
+                value = self._search(depth - 1, preferred)[1]
+            else:
+                value = env.get_x_position()
+            if value > best[1]:
+                best = (action, value)
 
-                else:
-                    curr_action = Action.JUMP_OBS
+        start.seek(0)
+        env.pyboy.load_state(start)
+        self._tt[key] = best
+        return best
 
-            elif row == 0:
-                curr_action = Action.UP  # when mario is off screen/ dead, move up
-            else:
-                curr_action = Action.RIGHT
+    def _search_parallel(self, depth, preferred):
+        """
+        Same search as _search, but every sequence of depth actions is played out at once across the worker pool,
+        each worker starting from a copy of the current save state. This process's emulator is never touched.
+        Returns (best action value, value)
+        """
+        env = self.environment
+        key = (env.game_area().tobytes(), env.get_x_position(), depth)
+        if key in self._tt:
+            return self._tt[key]
+
+        if self._pool is None:
+            # spawn rather than fork, the parent has an emulator window and the video thread running
+            self._pool = multiprocessing.get_context("spawn").Pool(_SEARCH_WORKERS, initializer=_init_search_worker)
+
+        start = io.BytesIO()
+        env.pyboy.save_state(start)
+        state = start.getvalue()
+
+        firsts = (preferred,) + tuple(a for a in _SEARCH_ACTIONS if a != preferred)
+        sequences = [(first,) + rest for first in firsts
+                     for rest in itertools.product(_SEARCH_ACTIONS, repeat=depth - 1)]
+        values = self._pool.starmap(_evaluate_sequence, [(sequence, state) for sequence in sequences])
+
+        best = (preferred, -math.inf)
+        for sequence, value in zip(sequences, values):
+            if value > best[1]:
+                best = (sequence[0], value)
+        self._tt[key] = best
+        return best
 
-        else:
-            curr_action = Action.UP
-        
-        # fix up stuck condition
-        if prev_action == Action.UP and curr_action == Action.UP:
-            curr_action = Action.RIGHT
-        
-        prev_action = curr_action # record current action
-
-        print("Action: ", curr_action)
-        prev_x = curr_x
-        return curr_action.value  # Return the value of the current action
-    
     def step(self):
         """
-        Runs each step of the game
+        Runs each step of the game. One decision per step: run_action holds the chosen buttons for at least act_freq
+        frames before the next choose_action, so decisions already run once per action rather than once per frame
         """
         #input("Press enter to continue") # for testing
         # Choose an action - button press or other...
@@ -593,6 +825,15 @@ class MarioExpert:
 
         self.stop_video()
 
+    @property
+    def video(self):
+        return self._video
+
+    @video.setter
+    def video(self, writer):
+        # start_video hands over a plain cv2.VideoWriter, encode its frames off the game loop
+        self._video = None if writer is None else AsyncVideoWriter(writer)
+
     def start_video(self, video_name, width, height, fps=30):
         """
         Do NOT edit this method.